@@ -0,0 +1,238 @@
+"""
+Perfis de navegador e sessão Chromium reutilizável para os logins.
+
+- `BROWSER_PROFILES`: flags de launch/contexto por perfil ("default" mantém o
+  comportamento original; "lean" reduz o consumo de memória por worker).
+- `BrowserSession`: mantém um browser aberto entre logins, criando um contexto
+  novo a cada login e reiniciando o browser após N logins ou acima de um limite
+  de RSS.
+- `RssSampler`: mede o pico de RSS (processo Python + Playwright + Chromium).
+
+A medição de RSS usa `psutil`; se ele não estiver instalado, percorre só a
+árvore do próprio processo em /proc (Linux) ou é ignorada.
+"""
+from pathlib import Path
+from threading import Event, Thread
+from typing import Optional
+import os
+
+BROWSER_PROFILES = {
+    "default": {
+        "launch_args": [],
+        "context_options": {},
+        "block_resource_types": [],
+    },
+    "lean": {
+        "launch_args": [
+            "--disable-dev-shm-usage",
+            "--disable-gpu",
+            "--disable-extensions",
+            "--disable-component-update",
+            "--disable-background-networking",
+            "--disable-default-apps",
+            "--disable-sync",
+            "--no-first-run",
+            "--mute-audio",
+            "--disable-features=Translate,MediaRouter,OptimizationHints,BackForwardCache,IsolateOrigins,site-per-process",
+            "--disable-site-isolation-trials",
+            "--renderer-process-limit=1",
+            "--disk-cache-size=1",
+            "--media-cache-size=1",
+            "--aggressive-cache-discard",
+            "--js-flags=--max-old-space-size=128",
+        ],
+        "context_options": {
+            "viewport": {"width": 800, "height": 600},
+            "device_scale_factor": 1,
+            "service_workers": "block",
+        },
+        "block_resource_types": ["image", "media", "font"],
+    },
+}
+
+
+def _children_from_proc(pid: int) -> list:
+    """Filhos diretos de `pid` via /proc/<pid>/task/<tid>/children (sem varrer o host inteiro)."""
+    children = []
+    try:
+        for task in (Path('/proc') / str(pid) / 'task').iterdir():
+            try:
+                children.extend(int(c) for c in (task / 'children').read_text().split())
+            except Exception:
+                continue
+    except Exception:
+        pass
+    return children
+
+
+def process_tree_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Soma o RSS (MB) do processo e de todos os descendentes. None se não for possível medir."""
+    if pid is None:
+        pid = os.getpid()
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                continue
+        return round(total / (1024 * 1024), 1)
+    except ImportError:
+        pass
+    except Exception:
+        return None
+
+    if not Path('/proc').exists():
+        return None
+    try:
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        total = 0
+        pending = [pid]
+        while pending:
+            current = pending.pop()
+            try:
+                resident = int((Path('/proc') / str(current) / 'statm').read_text().split()[1])
+                total += resident * page_size
+            except Exception:
+                pass
+            pending.extend(_children_from_proc(current))
+        return round(total / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+class RssSampler:
+    """Amostra o RSS da árvore de processos em background e guarda o pico."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = Event()
+        self._thread = None
+
+    def _sample(self):
+        value = process_tree_rss_mb()
+        if value is not None and (self.peak_mb is None or value > self.peak_mb):
+            self.peak_mb = value
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._sample()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Optional[float]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+        self._sample()
+        return self.peak_mb
+
+
+class BrowserSession:
+    """Browser Chromium compartilhado entre logins, com política de reciclagem.
+
+    Cada login recebe um contexto novo (cookies isolados). O browser é
+    reiniciado após `recycle_after` logins (0 = nunca) ou quando o RSS da árvore
+    de processos passa de `max_rss_mb` (0 = sem limite).
+    """
+
+    def __init__(self, headless: bool = True, profile: str = "default",
+                 recycle_after: int = 0, max_rss_mb: float = 0):
+        if profile not in BROWSER_PROFILES:
+            raise ValueError(f"Perfil de navegador desconhecido: {profile}")
+        self.headless = headless
+        self.profile = profile
+        self.recycle_after = max(int(recycle_after), 0)
+        self.max_rss_mb = max(float(max_rss_mb), 0.0)
+        self.context = None
+        self.browser_logins = 0
+        self.recycles = 0
+        self._playwright = None
+        self._browser = None
+
+    def _ensure_browser(self):
+        if self._playwright is None:
+            from playwright.sync_api import sync_playwright
+            self._playwright = sync_playwright().start()
+        if self._browser is not None and not self._browser.is_connected():
+            # Chromium caiu (crash/OOM): descarta o objeto morto e relança
+            print("Browser desconectado; relançando.")
+            self._close_browser()
+            self.recycles += 1
+        if self._browser is None:
+            cfg = BROWSER_PROFILES[self.profile]
+            self._browser = self._playwright.chromium.launch(headless=self.headless, args=cfg["launch_args"])
+            self.browser_logins = 0
+
+    def new_page(self):
+        """Abre um contexto novo (fechando o anterior, se houver) e retorna uma página."""
+        self.close_context()
+        self._ensure_browser()
+        cfg = BROWSER_PROFILES[self.profile]
+        self.context = self._browser.new_context(**cfg["context_options"])
+        blocked = set(cfg["block_resource_types"])
+        if blocked:
+            self.context.route("**/*", lambda route: route.abort() if route.request.resource_type in blocked else route.continue_())
+        return self.context.new_page()
+
+    def close_context(self):
+        if self.context is not None:
+            try:
+                self.context.close()
+            except Exception:
+                pass
+            self.context = None
+
+    def end_login(self) -> Optional[str]:
+        """Fecha o contexto do login atual e recicla o browser se necessário.
+
+        Retorna o motivo da reciclagem ("logins" ou "rss") ou None.
+        """
+        self.close_context()
+        self.browser_logins += 1
+        reason = None
+        if self.recycle_after and self.browser_logins >= self.recycle_after:
+            reason = "logins"
+        elif self.max_rss_mb:
+            rss = process_tree_rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                reason = "rss"
+        if reason:
+            self._close_browser()
+            self.recycles += 1
+        return reason
+
+    def force_recycle(self):
+        """Descarta o browser atual (ex.: após crash); o próximo login relança um novo."""
+        self.close_context()
+        self._close_browser()
+        self.browser_logins = 0
+        self.recycles += 1
+
+    def is_browser_alive(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    def _close_browser(self):
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+    def close(self):
+        self.close_context()
+        self._close_browser()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
@@ -21,6 +21,8 @@ from datetime import datetime, timezone
 from typing import Optional
 import json
 
+from browser_session import BrowserSession
+
 load_dotenv()
 
 HOTMART_LOGIN_URL = "https://sso.hotmart.com/login?passwordless=false&service=https%3A%2F%2Fsso.hotmart.com%2Foauth2.0%2FcallbackAuthorize%3Fclient_id%3D8cef361b-94f8-4679-bd92-9d1cb496452d%26redirect_uri%3Dhttps%253A%252F%252Fapp.hotmart.com%252Fauth%252Flogin%26response_type%3Dcode%26response_mode%3Dquery%26client_name%3DCasOAuthClient"
@@ -108,9 +110,184 @@ def _append_action_to_task(task_id: str, action: dict):
         pass
 
 
-def login(headless: bool = True, timeout: int = 20, screenshot_on_failure: bool = True, task_id: str = "TASK-20251031-001") -> bool:
+def _perform_login(page, email: str, password: str, timeout: int, screenshot_on_failure: bool,
+                   screenshots_dir: Optional[Path], task_id: str, run_info: Optional[dict] = None) -> bool:
+    """Preenche e submete o formulário na página já aberta. Retorna True se o login parecer bem-sucedido."""
+    from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+    print(f"Abrindo {HOTMART_LOGIN_URL} ...")
+    if run_info is not None:
+        run_info['navigated'] = True
+    page.goto(HOTMART_LOGIN_URL, timeout=timeout * 1000)
+
+    # Preencher email
+    email_found = False
+    for sel in _SELECTORS_CFG.get('email_selectors', []):
+        try:
+            if page.query_selector(sel):
+                page.fill(sel, email)
+                email_found = True
+                break
+        except Exception:
+            continue
+    if not email_found:
+        print("Não foi possível localizar o campo de email no formulário (seletores testados).")
+        if screenshot_on_failure and screenshots_dir is not None:
+            saved = _save_screenshot(page, screenshots_dir, 'missing_email')
+            if saved:
+                print(f"Screenshot de debug salva em: {saved}")
+                _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "screenshot", "reason": "missing_email", "file": str(saved)})
+        return False
+
+    # Preencher senha
+    password_found = False
+    for sel in _SELECTORS_CFG.get('password_selectors', []):
+        try:
+            if page.query_selector(sel):
+                page.fill(sel, password)
+                password_found = True
+                break
+        except Exception:
+            continue
+    if not password_found:
+        print("Não foi possível localizar o campo de senha no formulário (seletores testados).")
+        if screenshot_on_failure and screenshots_dir is not None:
+            saved = _save_screenshot(page, screenshots_dir, 'missing_password')
+            if saved:
+                print(f"Screenshot de debug salva em: {saved}")
+                _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "screenshot", "reason": "missing_password", "file": str(saved)})
+        return False
+
+    # Submeter o formulário: tenta clicar no botão de login
+    clicked = False
+    for sel in _SELECTORS_CFG.get('submit_selectors', []):
+        try:
+            btn = page.query_selector(sel)
+            if btn:
+                btn.click()
+                clicked = True
+                break
+        except Exception:
+            continue
+
+    if not clicked:
+        # Tenta enviar Enter no campo de senha
+        try:
+            page.press('input[type=password]', 'Enter')
+        except Exception:
+            # se não der, tenta screenshot e falha
+            if screenshot_on_failure and screenshots_dir is not None:
+                saved = _save_screenshot(page, screenshots_dir, 'submit_failed')
+                if saved:
+                    print(f"Screenshot de debug salva em: {saved}")
+                    _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "screenshot", "reason": "submit_failed", "file": str(saved)})
+            print("Não foi possível submeter o formulário.")
+            return False
+
+    # Aguardar navegação/indicador de sucesso
+    try:
+        # espera por redirect ou por um elemento que indica área autenticada
+        page.wait_for_load_state('networkidle', timeout=timeout * 1000)
+    except PlaywrightTimeout:
+        pass
+
+    sleep(1)
+
+    current_url = page.url
+    print(f"URL atual após submissão: {current_url}")
+
+    # Heurística simples: se mudou para sso.hotmart.com/ ou contém 'dashboard' ou 'home'
+    success_indicators = _SELECTORS_CFG.get('success_indicators', ["dashboard", "home", "app.hotmart", "go.hotmart"])
+    if any(ind in current_url for ind in success_indicators):
+        # registra ação de sucesso
+        _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "login_success", "url": current_url})
+        return True
+
+    # Ou verificar se existe algum elemento que apareça quando logado
+    logged_selector_candidates = _SELECTORS_CFG.get('logged_selector_candidates', [".user-menu", "[data-qa=account-avatar]", "img.profile"])
+    for s in logged_selector_candidates:
+        try:
+            if page.query_selector(s):
+                _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "login_success", "detected_by": s, "url": page.url})
+                return True
+        except Exception:
+            continue
+
+    # Falha: salvar screenshot para debug
+    print("Não detectado sucesso no login. Verifique credenciais e seletores.")
+    if screenshot_on_failure and screenshots_dir is not None:
+        saved = _save_screenshot(page, screenshots_dir, 'login_failed')
+        if saved:
+            print(f"Screenshot de debug salva em: {saved}")
+            # registra ação simples no actions.log
+            try:
+                actions_log = Path(__file__).resolve().parent / '.history' / task_id / 'actions.log'
+                with open(actions_log, 'a', encoding='utf-8') as al:
+                    al.write('{"task_id":"' + task_id + '","timestamp":"' + datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ') + '","type":"screenshot","file":"' + str(saved).replace('\\','/') + '"}\n')
+            except Exception:
+                pass
+            # adiciona ação ao task.json
+            _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "screenshot", "reason": "login_failed", "file": str(saved)})
+    return False
+
+
+_BROWSER_CLOSED_MARKERS = ("target closed", "has been closed", "browser closed", "target crashed", "page crashed")
+
+
+def _is_browser_closed_error(exc: Exception, session: BrowserSession) -> bool:
+    """Indica se a exceção veio de browser/contexto/página fechados ou de um crash do Chromium."""
+    message = str(exc).lower()
+    if any(marker in message for marker in _BROWSER_CLOSED_MARKERS):
+        return True
+    try:
+        return session.context is not None and not session.is_browser_alive()
+    except Exception:
+        return False
+
+
+def _start_profiling(session: BrowserSession, page):
+    """Liga o tracing do Playwright no contexto atual e passa a registrar os tempos de rede."""
+    from task_profiler import NetworkRecorder
+    recorder = NetworkRecorder()
+    recorder.attach(page)
+    try:
+        session.context.tracing.start(screenshots=True, snapshots=True)
+    except Exception as e:
+        print("Falha ao iniciar tracing do Playwright:", e)
+    return recorder
+
+
+def _stop_profiling(session: BrowserSession, recorder, profile_dir: Path, task_id: str):
+    """Salva trace.zip e network.json em profile_dir (antes de o contexto ser fechado)."""
+    from task_profiler import TRACE_FILE
+    files = []
+    try:
+        trace_path = profile_dir / TRACE_FILE
+        session.context.tracing.stop(path=str(trace_path))
+        files.append(str(trace_path))
+    except Exception as e:
+        print("Falha ao salvar trace do Playwright:", e)
+    network_path = recorder.save(profile_dir)
+    if network_path:
+        files.append(str(network_path))
+    if files:
+        _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "profile", "files": files})
+
+
+def login(headless: bool = True, timeout: int = 20, screenshot_on_failure: bool = True, task_id: str = "TASK-20251031-001",
+          profile: str = "default", session: Optional[BrowserSession] = None, profile_dir: Optional[Path] = None,
+          run_info: Optional[dict] = None) -> bool:
     """Tenta logar na Hotmart usando credenciais do .env.
 
+    `profile` escolhe o perfil de navegador (ver browser_session.BROWSER_PROFILES).
+    Se `session` for informada, o browser dela é reutilizado (modo de longa
+    duração) e a reciclagem fica a cargo da sessão; caso contrário um browser
+    é aberto e fechado só para este login.
+    Se `profile_dir` for informado, grava trace do Playwright e tempos de rede
+    nessa pasta (ver task_profiler).
+    Se `run_info` for informado, recebe `navigated=True` quando a página do SSO
+    chega a ser acessada (falhas anteriores não indicam throttling).
+
     Retorna True se o login parecer bem-sucedido, False caso contrário.
     """
     email = getenv("HOTMART_EMAIL")
@@ -130,142 +307,35 @@ def login(headless: bool = True, timeout: int = 20, screenshot_on_failure: bool
 
     # Lazy import para evitar exigir playwright se ainda não instalado
     try:
-        from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+        import playwright.sync_api  # noqa: F401
     except Exception as e:
         print("Playwright não encontrado. Instale as dependências: pip install -r requirements.txt")
         print(e)
         return False
 
+    own_session = session is None
+    recorder = None
+    forced_recycle = False
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=headless)
-            context = browser.new_context()
-            page = context.new_page()
-
-            print(f"Abrindo {HOTMART_LOGIN_URL} ...")
-            page.goto(HOTMART_LOGIN_URL, timeout=timeout * 1000)
-
-            # Preencher email
-            email_found = False
-            for sel in _SELECTORS_CFG.get('email_selectors', []):
-                try:
-                    if page.query_selector(sel):
-                        page.fill(sel, email)
-                        email_found = True
-                        break
-                except Exception:
-                    continue
-            if not email_found:
-                print("Não foi possível localizar o campo de email no formulário (seletores testados).")
-                if screenshot_on_failure and screenshots_dir is not None:
-                    saved = _save_screenshot(page, screenshots_dir, 'missing_email')
-                    if saved:
-                        print(f"Screenshot de debug salva em: {saved}")
-                        _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "screenshot", "reason": "missing_email", "file": str(saved)})
-                browser.close()
-                return False
-
-            # Preencher senha
-            password_found = False
-            for sel in _SELECTORS_CFG.get('password_selectors', []):
-                try:
-                    if page.query_selector(sel):
-                        page.fill(sel, password)
-                        password_found = True
-                        break
-                except Exception:
-                    continue
-            if not password_found:
-                print("Não foi possível localizar o campo de senha no formulário (seletores testados).")
-                if screenshot_on_failure and screenshots_dir is not None:
-                    saved = _save_screenshot(page, screenshots_dir, 'missing_password')
-                    if saved:
-                        print(f"Screenshot de debug salva em: {saved}")
-                        _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "screenshot", "reason": "missing_password", "file": str(saved)})
-                browser.close()
-                return False
-
-            # Submeter o formulário: tenta clicar no botão de login
-            clicked = False
-            for sel in _SELECTORS_CFG.get('submit_selectors', []):
-                try:
-                    btn = page.query_selector(sel)
-                    if btn:
-                        btn.click()
-                        clicked = True
-                        break
-                except Exception:
-                    continue
-
-            if not clicked:
-                # Tenta enviar Enter no campo de senha
-                try:
-                    page.press('input[type=password]', 'Enter')
-                except Exception:
-                    # se não der, tenta screenshot e falha
-                    if screenshot_on_failure and screenshots_dir is not None:
-                        saved = _save_screenshot(page, screenshots_dir, 'submit_failed')
-                        if saved:
-                            print(f"Screenshot de debug salva em: {saved}")
-                            _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "screenshot", "reason": "submit_failed", "file": str(saved)})
-                    print("Não foi possível submeter o formulário.")
-                    browser.close()
-                    return False
-
-            # Aguardar navegação/indicador de sucesso
-            try:
-                # espera por redirect ou por um elemento que indica área autenticada
-                page.wait_for_load_state('networkidle', timeout=timeout * 1000)
-            except PlaywrightTimeout:
-                pass
-
-            sleep(1)
-
-            current_url = page.url
-            print(f"URL atual após submissão: {current_url}")
-
-            # Heurística simples: se mudou para sso.hotmart.com/ ou contém 'dashboard' ou 'home'
-            success_indicators = _SELECTORS_CFG.get('success_indicators', ["dashboard", "home", "app.hotmart", "go.hotmart"])
-            if any(ind in current_url for ind in success_indicators):
-                # registra ação de sucesso
-                _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "login_success", "url": current_url})
-                browser.close()
-                return True
-
-            # Ou verificar se existe algum elemento que apareça quando logado
-            logged_selector_candidates = _SELECTORS_CFG.get('logged_selector_candidates', [".user-menu", "[data-qa=account-avatar]", "img.profile"])
-            for s in logged_selector_candidates:
-                try:
-                    if page.query_selector(s):
-                        _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "login_success", "detected_by": s, "url": page.url})
-                        browser.close()
-                        return True
-                except Exception:
-                    continue
-
-            # Falha: salvar screenshot para debug
-            print("Não detectado sucesso no login. Verifique credenciais e seletores.")
-            if screenshot_on_failure and screenshots_dir is not None:
-                saved = _save_screenshot(page, screenshots_dir, 'login_failed')
-                if saved:
-                    print(f"Screenshot de debug salva em: {saved}")
-                    # registra ação simples no actions.log
-                    try:
-                        actions_log = Path(__file__).resolve().parent / '.history' / task_id / 'actions.log'
-                        with open(actions_log, 'a', encoding='utf-8') as al:
-                            al.write('{"task_id":"' + task_id + '","timestamp":"' + datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ') + '","type":"screenshot","file":"' + str(saved).replace('\\','/') + '"}\n')
-                    except Exception:
-                        pass
-                    # adiciona ação ao task.json
-                    _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "screenshot", "reason": "login_failed", "file": str(saved)})
-            browser.close()
-            return False
+        if own_session:
+            session = BrowserSession(headless=headless, profile=profile)
+        page = session.new_page()
+        if profile_dir is not None:
+            recorder = _start_profiling(session, page)
+        return _perform_login(page, email, password, timeout, screenshot_on_failure, screenshots_dir, task_id, run_info)
 
     except Exception as exc:
         print("Erro durante a automação:", exc)
+        # browser/target fechado (crash, OOM): recicla para não falhar nos próximos logins
+        if not own_session and session is not None and _is_browser_closed_error(exc, session):
+            session.force_recycle()
+            forced_recycle = True
+            print("Browser reciclado (motivo: crash).")
+            _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "browser_recycled", "reason": "crash"})
+            page = None
         # tenta salvar screenshot se houver página disponível
         try:
-            if screenshot_on_failure and 'page' in locals() and screenshots_dir is not None:
+            if screenshot_on_failure and locals().get('page') is not None and screenshots_dir is not None:
                 saved = _save_screenshot(page, screenshots_dir, 'exception')
                 if saved:
                     print(f"Screenshot de debug salva em: {saved}")
@@ -279,3 +349,16 @@ def login(headless: bool = True, timeout: int = 20, screenshot_on_failure: bool
         except Exception as e:
             print("Falha ao capturar screenshot da exceção:", e)
         return False
+
+    finally:
+        if recorder is not None:
+            _stop_profiling(session, recorder, profile_dir, task_id)
+        if session is not None:
+            if own_session:
+                session.close()
+            elif not forced_recycle:
+                # após reciclagem forçada o browser já foi descartado; não conta o login de novo
+                reason = session.end_login()
+                if reason:
+                    print(f"Browser reciclado (motivo: {reason}).")
+                    _append_action_to_task(task_id, {"timestamp": datetime.now(timezone.utc).isoformat(), "type": "browser_recycled", "reason": reason})
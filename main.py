@@ -6,6 +6,7 @@ from pathlib import Path
 from datetime import datetime, timezone
 import argparse
 import json
+from os import getenv
 from typing import Optional
 import sys
 
@@ -68,6 +69,21 @@ except Exception:
     # mantém o fallback
     pass
 
+# Sessão de browser reutilizável e medição de RSS são opcionais (sem elas cada login abre seu próprio browser).
+BrowserSession = None
+RssSampler = None
+try:
+    from browser_session import BrowserSession, RssSampler
+except Exception:
+    pass
+
+# Governador de taxa é opcional: sem ele o login roda sem limite (comportamento antigo).
+RateGovernor = None
+try:
+    from rate_governor import RateGovernor
+except Exception:
+    pass
+
 
 def _generate_task_id(history_root: Path = None) -> str:
     """Gera um task_id no formato TASK-YYYYMMDD-NNN baseado nas pastas existentes em .history."""
@@ -193,37 +209,53 @@ def _print_summary_entries(entries: list, task_id: Optional[str] = None):
             print(f'End     : {end}')
         if duration is not None:
             print(f'Duration: {duration} s')
+        queue_wait = e.get('queue_wait_seconds')
+        if queue_wait is not None:
+            print(f'Fila    : {queue_wait} s')
+        peak_rss = e.get('peak_rss_mb')
+        if peak_rss is not None:
+            print(f'Pico RSS: {peak_rss} MB')
         desc = e.get('description')
         if desc:
             print(f'Desc    : {desc}')
     print('---')
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Executa o login na Hotmart usando credenciais em .env")
-    group = parser.add_mutually_exclusive_group()
-    group.add_argument('--headless', dest='headless', action='store_true', help='Executar em modo headless (sem UI)')
-    group.add_argument('--no-headless', dest='headless', action='store_false', help='Executar com UI visível (headful) para depuração')
-    parser.set_defaults(headless=True)
-    parser.add_argument('--timeout', type=int, default=20, help='Timeout em segundos para operações do navegador')
-    parser.add_argument('--task-id', type=str, default=None, help='Task ID para logs/screenshots (gerado automaticamente se omitido)')
-    parser.add_argument('--list-tasks', action='store_true', help='Listar tasks do .history/summary.log de forma legível')
-    args = parser.parse_args()
+def _env_number(name: str, default, cast):
+    """Lê um número de variável de ambiente; valor inválido gera aviso e usa o default."""
+    raw = getenv(name)
+    if raw is None or raw.strip() == '':
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        print(f"Valor inválido em {name}={raw!r}; usando {default}.")
+        return default
+
+
+def _login_ready() -> bool:
+    """Verifica se o login pode de fato acessar o SSO (módulo real, Playwright e credenciais)."""
+    if login is _fallback_login:
+        return False
+    try:
+        import importlib.util
+        if importlib.util.find_spec('playwright') is None:
+            return False
+    except Exception:
+        return False
+    return bool(getenv("HOTMART_EMAIL") and getenv("HOTMART_PASSWORD"))
 
-    # Se solicitado, listar tasks e sair
-    if getattr(args, 'list_tasks', False):
-        entries = _read_summary_entries()
-        _print_summary_entries(entries, task_id=args.task_id)
-        exit(0)
 
+def _run_task(args, task_id: Optional[str], governor=None, session=None) -> bool:
+    """Executa um login completo registrando a task em .history (summary.log, task.json, actions.log)."""
     # Gerar task_id automaticamente se não fornecido
     auto_generated = False
-    if not args.task_id:
-        args.task_id = _generate_task_id()
+    if not task_id:
+        task_id = _generate_task_id()
         auto_generated = True
     # Garantir que exista a pasta da task no histórico
     try:
-        (Path(__file__).resolve().parent / '.history' / args.task_id).mkdir(parents=True, exist_ok=True)
+        (Path(__file__).resolve().parent / '.history' / task_id).mkdir(parents=True, exist_ok=True)
     except Exception:
         pass
 
@@ -234,7 +266,7 @@ if __name__ == "__main__":
         start_iso = start_time.isoformat()
         summary_entry = {
             "date": start_iso,
-            "task_id": args.task_id,
+            "task_id": task_id,
             "title": "Automated login run",
             "description": "Task gerada automaticamente para execução de login via script",
             "start_time": start_iso,
@@ -244,27 +276,91 @@ if __name__ == "__main__":
             "status": "Em Progresso"
         }
         _write_summary_entry(summary_entry)
-        _create_task_json(args.task_id, "Automated login run", "Task gerada automaticamente para execução de login via script")
+        _create_task_json(task_id, "Automated login run", "Task gerada automaticamente para execução de login via script")
         # atualiza task.json para Em Progresso
-        _update_task_json(args.task_id, {"status": "Em Progresso"})
+        _update_task_json(task_id, {"status": "Em Progresso"})
+
+    # Aguarda vaga no governador de taxa (compartilhado entre processos do host).
+    # Se o login nem vai chegar ao SSO, não consome vaga nem afeta a taxa.
+    ticket = None
+    if governor is not None and _login_ready():
+        try:
+            ticket = governor.acquire()
+        except Exception as e:
+            print("Governador de taxa indisponível, seguindo sem limite:", e)
+            ticket = None
+    if ticket is not None:
+        queue_wait = ticket['queue_wait_seconds']
+        if queue_wait > 0:
+            print(f"Aguardou {queue_wait} s na fila do governador (taxa atual: {ticket['rate_per_minute']}/min)")
+        _update_summary_entry(task_id, {"queue_wait_seconds": queue_wait})
+        _update_task_json(task_id, {"queue_wait_seconds": queue_wait})
+        try:
+            actions_log = Path(__file__).resolve().parent / '.history' / task_id / 'actions.log'
+            with open(actions_log, 'a', encoding='utf-8') as al:
+                al.write(json.dumps({"task_id": task_id, "timestamp": datetime.now(timezone.utc).isoformat(), "type": "governor_wait", "queue_wait_seconds": queue_wait, "rate_per_minute": ticket['rate_per_minute'], "in_flight": ticket['in_flight']}, ensure_ascii=False) + '\n')
+        except Exception:
+            pass
 
+    # Mede o pico de RSS (Python + Playwright + Chromium) durante o login
+    sampler = RssSampler().start() if RssSampler is not None else None
+    # Profiling profundo (--profile deep): trace do Playwright + cProfile em torno do login
+    profile_dir = None
+    profiler = None
+    if args.deep_profile:
+        try:
+            import cProfile
+            from task_profiler import ensure_profile_dir
+            profile_dir = ensure_profile_dir(task_id)
+            profiler = cProfile.Profile()
+        except Exception as e:
+            print("Profiling indisponível, seguindo sem profile:", e)
+            profile_dir = None
+            profiler = None
     # Executa o login usando as credenciais em .env
     run_start = datetime.now(timezone.utc)
-    success = login(headless=args.headless, timeout=args.timeout, task_id=args.task_id)
-    run_end = datetime.now(timezone.utc)
-    duration = (run_end - run_start).total_seconds()
+    success = False
+    run_info = {}
+    try:
+        if profiler is not None:
+            profiler.enable()
+        success = login(headless=args.headless, timeout=args.timeout, task_id=task_id,
+                        profile=args.profile, session=session, profile_dir=profile_dir,
+                        run_info=run_info)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        run_end = datetime.now(timezone.utc)
+        duration = (run_end - run_start).total_seconds()
+        peak_rss_mb = sampler.stop() if sampler is not None else None
+        if profiler is not None:
+            try:
+                from task_profiler import PYTHON_PROFILE_FILE
+                profiler.dump_stats(str(profile_dir / PYTHON_PROFILE_FILE))
+                _update_task_json(task_id, {"profile_dir": str(profile_dir)})
+            except Exception as e:
+                print("Falha ao salvar profile Python:", e)
+        if governor is not None and ticket is not None:
+            try:
+                # falhas antes de abrir a página do SSO não indicam throttling; runs com
+                # profiling têm overhead próprio e também não alimentam o limitador
+                outcome_signal = success if run_info.get('navigated') and not args.deep_profile else None
+                new_rate = governor.release(ticket, success=outcome_signal, duration=duration)
+                _update_task_json(task_id, {"governor_rate_per_minute": new_rate})
+            except Exception:
+                pass
 
     # Atualiza summary.log e task.json com resultado
     end_iso = run_end.isoformat()
     outcome = "success" if success else "failure"
     status = "Concluída" if success else "Falha"
-    _update_summary_entry(args.task_id, {"end_time": end_iso, "outcome": outcome, "duration_seconds": duration, "status": status})
-    _update_task_json(args.task_id, {"status": status, "result": outcome})
+    _update_summary_entry(task_id, {"end_time": end_iso, "outcome": outcome, "duration_seconds": duration, "status": status, "peak_rss_mb": peak_rss_mb})
+    _update_task_json(task_id, {"status": status, "result": outcome, "browser_profile": args.profile, "peak_rss_mb": peak_rss_mb})
     # adiciona linha em actions.log
     try:
-        actions_log = Path(__file__).resolve().parent / '.history' / args.task_id / 'actions.log'
+        actions_log = Path(__file__).resolve().parent / '.history' / task_id / 'actions.log'
         with open(actions_log, 'a', encoding='utf-8') as al:
-            al.write(json.dumps({"task_id": args.task_id, "timestamp": run_end.isoformat(), "type": "run", "outcome": outcome, "duration_seconds": duration}, ensure_ascii=False) + '\n')
+            al.write(json.dumps({"task_id": task_id, "timestamp": run_end.isoformat(), "type": "run", "outcome": outcome, "duration_seconds": duration, "peak_rss_mb": peak_rss_mb}, ensure_ascii=False) + '\n')
     except Exception:
         pass
 
@@ -272,3 +368,71 @@ if __name__ == "__main__":
         print("Login realizado com sucesso.")
     else:
         print("Falha no login. Verifique .env, seletores e a conectividade.")
+    return success
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa o login na Hotmart usando credenciais em .env")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--headless', dest='headless', action='store_true', help='Executar em modo headless (sem UI)')
+    group.add_argument('--no-headless', dest='headless', action='store_false', help='Executar com UI visível (headful) para depuração')
+    parser.set_defaults(headless=True)
+    parser.add_argument('--timeout', type=int, default=20, help='Timeout em segundos para operações do navegador')
+    parser.add_argument('--task-id', type=str, default=None, help='Task ID para logs/screenshots (gerado automaticamente se omitido)')
+    parser.add_argument('--list-tasks', action='store_true', help='Listar tasks do .history/summary.log de forma legível')
+    parser.add_argument('--rate-per-minute', type=float, default=_env_number('HOTMART_RATE_PER_MINUTE', 6.0, float), help='Teto de logins por minuto no host (compartilhado entre processos)')
+    parser.add_argument('--max-concurrency', type=int, default=_env_number('HOTMART_MAX_CONCURRENCY', 2, int), help='Máximo de logins simultâneos no host')
+    parser.add_argument('--slow-threshold', type=float, default=60.0, help='Duração (s) acima da qual o login é considerado lento e a taxa é reduzida')
+    parser.add_argument('--no-governor', action='store_true', help='Desativar o governador de taxa entre processos')
+    parser.add_argument('--profile', nargs='?', const='deep', default='default',
+                        help='Perfis separados por vírgula: "lean" reduz o uso de memória do navegador; '
+                             '"deep" (ou --profile sem valor) grava trace do Playwright e cProfile em .history/<task_id>/profile/')
+    parser.add_argument('--profile-report', nargs='*', metavar='TASK_ID', default=None,
+                        help='Resumir funções Python mais quentes e requisições mais lentas das tasks com profile (todas se nenhuma for informada)')
+    parser.add_argument('--top', type=int, default=15, help='Quantidade de linhas por seção em --profile-report')
+    parser.add_argument('--runs', type=int, default=1, help='Número de logins sequenciais neste processo (>1 reutiliza o browser entre logins)')
+    parser.add_argument('--recycle-after', type=int, default=20, help='Com --runs > 1, reinicia o browser após N logins (0 = nunca)')
+    parser.add_argument('--max-rss-mb', type=float, default=0, help='Com --runs > 1, reinicia o browser quando o RSS total passar deste valor (0 = sem limite)')
+    args = parser.parse_args()
+
+    # --profile aceita "lean", "deep" ou ambos ("lean,deep")
+    profile_tokens = [t.strip() for t in args.profile.split(',') if t.strip()]
+    invalid = [t for t in profile_tokens if t not in ('default', 'lean', 'deep')]
+    if invalid:
+        parser.error(f"valor inválido para --profile: {', '.join(invalid)} (use default, lean e/ou deep)")
+    args.deep_profile = 'deep' in profile_tokens
+    args.profile = 'lean' if 'lean' in profile_tokens else 'default'
+
+    # Se solicitado, listar tasks e sair
+    if getattr(args, 'list_tasks', False):
+        entries = _read_summary_entries()
+        _print_summary_entries(entries, task_id=args.task_id)
+        exit(0)
+
+    # Se solicitado, resumir os profiles gravados e sair
+    if args.profile_report is not None:
+        from task_profiler import summarize_profiles
+        summarize_profiles(args.profile_report, top=args.top)
+        exit(0)
+
+    governor = None
+    if RateGovernor is not None and not args.no_governor:
+        try:
+            governor = RateGovernor(rate_per_minute=args.rate_per_minute, max_concurrency=args.max_concurrency,
+                                    slow_threshold=args.slow_threshold)
+        except Exception as e:
+            print("Governador de taxa indisponível, seguindo sem limite:", e)
+            governor = None
+
+    # Modo de longa duração: um único browser para vários logins, com reciclagem
+    session = None
+    if args.runs > 1 and BrowserSession is not None:
+        session = BrowserSession(headless=args.headless, profile=args.profile,
+                                 recycle_after=args.recycle_after, max_rss_mb=args.max_rss_mb)
+    try:
+        for run_index in range(max(args.runs, 1)):
+            # --task-id vale apenas para o primeiro login; os seguintes geram IDs novos
+            _run_task(args, args.task_id if run_index == 0 else None, governor=governor, session=session)
+    finally:
+        if session is not None:
+            session.close()
@@ -0,0 +1,185 @@
+"""
+Governador de taxa entre processos para as requisições ao SSO da Hotmart.
+
+Vários processos `main.py` rodando em paralelo no mesmo host compartilham um
+token bucket persistido em disco (protegido por lock de arquivo), de forma que:
+- a taxa de logins por minuto nunca ultrapasse o teto configurado;
+- no máximo `max_concurrency` logins fiquem em andamento ao mesmo tempo;
+- a taxa se adapte (AIMD): sobe aos poucos enquanto os logins vão bem e cai
+  pela metade quando há falha ou resposta lenta (no máximo uma vez por evento
+  de congestionamento).
+
+O estado fica em `<tempdir>/hotmart-governor/` (ou em HOTMART_GOVERNOR_DIR).
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from time import sleep, time
+from typing import Optional
+import json
+import os
+import tempfile
+import uuid
+
+
+def _default_state_dir() -> Path:
+    env_dir = os.getenv('HOTMART_GOVERNOR_DIR')
+    if env_dir:
+        return Path(env_dir)
+    return Path(tempfile.gettempdir()) / 'hotmart-governor'
+
+
+@contextmanager
+def _file_lock(lock_path: Path):
+    """Lock exclusivo entre processos usando um arquivo (fcntl no POSIX, msvcrt no Windows)."""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+') as fh:
+        if os.name == 'nt':
+            import msvcrt
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK desiste após ~10s; continua tentando
+                    continue
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _pid_alive(pid: int) -> bool:
+    """Verifica se o processo ainda existe. No Windows confia apenas no lease."""
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except Exception:
+        return True
+    return True
+
+
+class RateGovernor:
+    """Token bucket + limite de concorrência compartilhados entre processos.
+
+    `rate_per_minute` é o teto; a taxa efetiva varia entre `min_rate_per_minute`
+    e esse teto conforme os resultados reportados em `release()`.
+    """
+
+    def __init__(self, rate_per_minute: float = 6.0, max_concurrency: int = 2,
+                 min_rate_per_minute: float = 1.0, slow_threshold: float = 60.0,
+                 additive_step: float = 1.0, decrease_factor: float = 0.5,
+                 burst: float = 1.0, lease_seconds: float = 600.0,
+                 state_dir: Optional[Path] = None):
+        self.max_rate = max(float(rate_per_minute), 0.01)
+        self.min_rate = min(max(float(min_rate_per_minute), 0.01), self.max_rate)
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.slow_threshold = float(slow_threshold)
+        self.additive_step = float(additive_step)
+        self.decrease_factor = float(decrease_factor)
+        self.burst = max(float(burst), 1.0)
+        self.lease_seconds = float(lease_seconds)
+        self.state_dir = Path(state_dir) if state_dir else _default_state_dir()
+        self._state_file = self.state_dir / 'state.json'
+        self._lock_file = self.state_dir / 'state.lock'
+
+    def _load_state(self, now: float) -> dict:
+        state = {}
+        try:
+            if self._state_file.exists():
+                with open(self._state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+        except Exception:
+            state = {}
+        state.setdefault('rate_per_minute', self.max_rate)
+        state.setdefault('tokens', self.burst)
+        state.setdefault('last_refill', now)
+        state.setdefault('slots', {})
+        state.setdefault('last_decrease', 0.0)
+        # o teto pode ter mudado desde a última execução
+        state['rate_per_minute'] = min(max(state['rate_per_minute'], self.min_rate), self.max_rate)
+        return state
+
+    def _save_state(self, state: dict):
+        tmp = self._state_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._state_file)
+
+    def _refill(self, state: dict, now: float):
+        elapsed = max(now - state['last_refill'], 0.0)
+        state['tokens'] = min(self.burst, state['tokens'] + elapsed * state['rate_per_minute'] / 60.0)
+        state['last_refill'] = now
+
+    def _expire_slots(self, state: dict, now: float):
+        slots = state['slots']
+        for slot_id in list(slots):
+            slot = slots[slot_id]
+            if slot.get('expires_at', 0) < now or not _pid_alive(slot.get('pid', 0)):
+                del slots[slot_id]
+
+    def acquire(self, poll_interval: float = 1.0) -> dict:
+        """Bloqueia até haver token e vaga livre. Retorna um ticket com `queue_wait_seconds`."""
+        start = time()
+        while True:
+            with _file_lock(self._lock_file):
+                now = time()
+                state = self._load_state(now)
+                self._refill(state, now)
+                self._expire_slots(state, now)
+                has_slot = len(state['slots']) < self.max_concurrency
+                if has_slot and state['tokens'] >= 1.0:
+                    state['tokens'] -= 1.0
+                    slot_id = uuid.uuid4().hex
+                    state['slots'][slot_id] = {"pid": os.getpid(), "acquired_at": now,
+                                               "expires_at": now + self.lease_seconds}
+                    self._save_state(state)
+                    return {"slot_id": slot_id, "acquired_at": now,
+                            "queue_wait_seconds": round(now - start, 3),
+                            "rate_per_minute": round(state['rate_per_minute'], 3),
+                            "in_flight": len(state['slots'])}
+                self._save_state(state)
+                if has_slot:
+                    wait = (1.0 - state['tokens']) * 60.0 / state['rate_per_minute']
+                else:
+                    wait = poll_interval
+            sleep(min(max(wait, 0.05), poll_interval))
+
+    def release(self, ticket: dict, success: Optional[bool], duration: Optional[float] = None) -> float:
+        """Libera a vaga e ajusta a taxa (AIMD). Retorna a nova taxa por minuto.
+
+        `success=None` indica resultado neutro (falha antes de acessar o SSO):
+        a taxa não muda e o token consumido é devolvido.
+        """
+        with _file_lock(self._lock_file):
+            now = time()
+            state = self._load_state(now)
+            self._refill(state, now)
+            # logins iniciados antes do último corte (incluindo este) pertencem ao mesmo evento
+            last_decrease = state['last_decrease']
+            same_event = any(slot.get('acquired_at', 0) <= last_decrease for slot in state['slots'].values())
+            state['slots'].pop(ticket.get('slot_id'), None)
+            if duration is None:
+                duration = now - ticket.get('acquired_at', now)
+            rate = state['rate_per_minute']
+            if success is None:
+                state['tokens'] = min(self.burst, state['tokens'] + 1.0)
+            elif success and duration <= self.slow_threshold:
+                rate = min(self.max_rate, rate + self.additive_step)
+            elif not same_event and now - last_decrease >= 60.0 / rate:
+                rate = max(self.min_rate, rate * self.decrease_factor)
+                state['last_decrease'] = now
+            state['rate_per_minute'] = rate
+            self._save_state(state)
+            return round(rate, 3)
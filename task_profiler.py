@@ -0,0 +1,137 @@
+"""
+Profiling profundo opcional por task (ativado com `main.py --profile`).
+
+Arquivos gerados em `.history/<task_id>/profile/`:
+- trace.zip: trace do Playwright (rede, snapshots de DOM, timings) — abra com `playwright show-trace`.
+- network.json: requisições finalizadas com duração, para o resumo agregado.
+- login.prof: saída do cProfile em torno de `login()` (compatível com pstats/snakeviz).
+
+Nada aqui é importado ou executado quando o profiling está desligado.
+"""
+from pathlib import Path
+from typing import List, Optional
+import json
+import pstats
+
+TRACE_FILE = 'trace.zip'
+NETWORK_FILE = 'network.json'
+PYTHON_PROFILE_FILE = 'login.prof'
+
+
+def _history_root() -> Path:
+    return Path(__file__).resolve().parent / '.history'
+
+
+def ensure_profile_dir(task_id: str) -> Path:
+    profile_dir = _history_root() / task_id / 'profile'
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    return profile_dir
+
+
+class NetworkRecorder:
+    """Guarda a duração de cada requisição finalizada da página (via `request.timing`)."""
+
+    def __init__(self):
+        self.requests = []
+
+    def attach(self, page):
+        page.on('requestfinished', self._on_finished)
+        page.on('requestfailed', self._on_failed)
+
+    def _record(self, request, failure: Optional[str] = None):
+        try:
+            timing = request.timing or {}
+            response_end = timing.get('responseEnd', -1)
+            self.requests.append({
+                "url": request.url,
+                "method": request.method,
+                "resource_type": request.resource_type,
+                "start_time": timing.get('startTime'),
+                "duration_ms": round(response_end, 1) if response_end is not None and response_end >= 0 else None,
+                "failure": failure,
+            })
+        except Exception:
+            pass
+
+    def _on_finished(self, request):
+        self._record(request)
+
+    def _on_failed(self, request):
+        self._record(request, failure=request.failure or 'failed')
+
+    def save(self, profile_dir: Path) -> Optional[Path]:
+        try:
+            path = profile_dir / NETWORK_FILE
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.requests, f, ensure_ascii=False, indent=2)
+            return path
+        except Exception as e:
+            print("Falha ao salvar network.json:", e)
+            return None
+
+
+def _profile_dirs(task_ids: Optional[List[str]] = None) -> List[Path]:
+    root = _history_root()
+    if task_ids:
+        candidates = [root / tid / 'profile' for tid in task_ids]
+    else:
+        candidates = sorted(root.glob('*/profile')) if root.exists() else []
+    return [d for d in candidates if d.is_dir()]
+
+
+def summarize_profiles(task_ids: Optional[List[str]] = None, top: int = 15):
+    """Imprime as funções Python mais quentes e as requisições mais lentas de um conjunto de tasks."""
+    dirs = _profile_dirs(task_ids)
+    if not dirs:
+        print('Nenhum profile encontrado em .history/<task_id>/profile/')
+        return
+
+    print(f"Tasks analisadas ({len(dirs)}): {', '.join(d.parent.name for d in dirs)}")
+
+    # carrega um arquivo por vez: um login.prof vazio/truncado não derruba o relatório
+    stats = None
+    for d in dirs:
+        prof_path = d / PYTHON_PROFILE_FILE
+        if not prof_path.exists():
+            continue
+        try:
+            if stats is None:
+                stats = pstats.Stats(str(prof_path))
+            else:
+                stats.add(str(prof_path))
+        except Exception as e:
+            print(f"Ignorando {prof_path}: {e!r}")
+    if stats is not None:
+        rows = []
+        for (filename, lineno, funcname), (cc, nc, tt, ct, _callers) in stats.stats.items():
+            rows.append((tt, ct, nc, f"{Path(filename).name}:{lineno}({funcname})"))
+        rows.sort(reverse=True)
+        print('---')
+        print(f'Python: top {top} por tempo próprio (somado entre tasks)')
+        print(f"{'self s':>9} {'cum s':>9} {'calls':>8}  função")
+        for tt, ct, nc, name in rows[:top]:
+            print(f'{tt:9.3f} {ct:9.3f} {nc:8d}  {name}')
+
+    network = []
+    for d in dirs:
+        path = d / NETWORK_FILE
+        if not path.exists():
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for req in json.load(f):
+                    if req.get('duration_ms') is not None:
+                        req['task_id'] = d.parent.name
+                        network.append(req)
+        except Exception:
+            continue
+    if network:
+        network.sort(key=lambda r: r['duration_ms'], reverse=True)
+        print('---')
+        print(f'Rede: top {top} requisições mais lentas')
+        for req in network[:top]:
+            url = req.get('url', '')
+            if len(url) > 100:
+                url = url[:97] + '...'
+            print(f"{req['duration_ms']:9.1f} ms  {req.get('task_id')}  {req.get('method')} {req.get('resource_type')}  {url}")
+    print('---')